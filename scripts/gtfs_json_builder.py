@@ -10,13 +10,27 @@ import urllib.request
 from pathlib import Path
 from datetime import datetime, timedelta, date
 from collections import defaultdict
-from typing import Dict, List, Tuple, Optional, Set
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import compress
+from operator import itemgetter
+from typing import Dict, Iterable, List, Tuple, Optional, Set
 try:
     from zoneinfo import ZoneInfo
 except Exception:
     ZoneInfo = None
+try:
+    import orjson
+except Exception:
+    orjson = None
 GTFS_URL_DEFAULT = "https://www.transportforireland.ie/transitData/Data/GTFS_Irish_Rail.zip"
 UNKNOWN_ROUTE_ID = "<unknown-route>"
+CSV_BUFFER_SIZE = 1 << 20
+NDJSON_BATCH_ROWS = 10000
+WEEKDAYS = ("monday","tuesday","wednesday","thursday","friday","saturday","sunday")
+PARALLEL_MIN_GROUPS = 64
+EPOCH = date(2000, 1, 1)
+EPOCH_ORD = EPOCH.toordinal()
 def _safe_float(v) -> float:
     try:
         s = ("" if v is None else str(v)).strip()
@@ -43,149 +57,256 @@ def _yyyymmdd_to_date(s: str) -> Optional[date]:
         return None
 def _date_to_yyyymmdd(d: date) -> str:
     return f"{d:%Y%m%d}"
+@lru_cache(maxsize=None)
+def _get_tz(name: str):
+    if not name or ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return None
+class CsvHeader(dict):
+    def __missing__(self, key):
+        return -1
+Table = Tuple[CsvHeader, List[List[str]]]
+def _as_dicts(table: Table) -> List[Dict]:
+    header, rows = table
+    names = list(header)
+    return [dict(zip(names, r)) for r in rows]
+def _first_value(table: Table, column: str) -> Optional[str]:
+    header, rows = table
+    if not rows or column not in header:
+        return None
+    return rows[0][header[column]]
 class ZipView:
     def __init__(self, zip_path: Path):
-        self.zf = zipfile.ZipFile(zip_path, "r")
-        self.map = {n.lower(): n for n in self.zf.namelist()}
-    def _find(self, filename: str) -> Optional[str]:
+        self.zf = zipfile.ZipFile(zip_path, "r", allowZip64=True)
+        self.info = {zi.filename.lower(): zi for zi in self.zf.infolist()}
+    def _find(self, filename: str) -> Optional[zipfile.ZipInfo]:
         target = filename.lower()
-        for name in self.map.values():
-            lo = name.lower()
-            if lo.endswith("/" + target) or lo == target:
-                return name
+        info = self.info.get(target)
+        if info is not None:
+            return info
+        for name, info in self.info.items():
+            if name.endswith("/" + target):
+                return info
         return None
-    def read_csv(self, filename: str) -> List[Dict]:
-        name = self._find(filename)
-        if not name:
-            return []
-        raw = self.zf.read(name)
-        f = io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8-sig", newline="")
-        return list(csv.DictReader(f))
+    def read_csv(self, filename: str) -> Table:
+        info = self._find(filename)
+        if info is None:
+            return CsvHeader(), []
+        raw = io.BufferedReader(self.zf.open(info, "r"), buffer_size=CSV_BUFFER_SIZE)
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            names = next(reader, [])
+            rows = [r for r in reader if r]
+        header = CsvHeader((n, i) for i, n in enumerate(names))
+        width = len(names)
+        blank = [""] * width
+        for r in rows:
+            if len(r) != width:
+                del r[width:]
+                r.extend(blank[len(r):])
+            # trailing "" slot: CsvHeader maps absent columns to -1
+            r.append("")
+        return header, rows
+def _write_bytes(chunks: Iterable[bytes], path: Path) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for data in chunks:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        os.fsync(fd)
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp)
+        raise
+    os.close(fd)
+    os.replace(tmp, path)
+def _write_json(obj, path: Path, pretty: bool = False) -> None:
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    elif pretty:
+        data = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    else:
+        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    _write_bytes((data,), path)
+def _write_ndjson(rows: List[Dict], path: Path) -> None:
+    if orjson is not None:
+        encode = orjson.dumps
+    else:
+        encode = lambda row: json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    def batches():
+        for i in range(0, len(rows), NDJSON_BATCH_ROWS):
+            yield b"".join(encode(row) + b"\n" for row in rows[i:i + NDJSON_BATCH_ROWS])
+    _write_bytes(batches(), path)
 def download_zip(url: str, dest: Path) -> Path:
     dest.parent.mkdir(parents=True, exist_ok=True)
     urllib.request.urlretrieve(url, dest)
     return dest
-def _weekday_mask(cal_row: Dict) -> Tuple[bool, bool, bool, bool, bool, bool, bool]:
-    return tuple(cal_row.get(day, "0") == "1" for day in
-                 ("monday","tuesday","wednesday","thursday","friday","saturday","sunday"))
-def _active_services_on(D: date, calendar_rows: List[Dict], calendar_dates_rows: List[Dict]) -> Set[str]:
-    wd = D.weekday()  
-    active = set()
-    for row in calendar_rows:
-        start = _yyyymmdd_to_date(row.get("start_date",""))
-        end   = _yyyymmdd_to_date(row.get("end_date",""))
-        if start and end and start <= D <= end:
-            if _weekday_mask(row)[wd]:
-                active.add(row["service_id"])
-    key = _date_to_yyyymmdd(D)
-    for exc in calendar_dates_rows:
-        if exc.get("date") == key:
-            sid = exc.get("service_id","")
-            t = exc.get("exception_type","")
-            if t == "1": active.add(sid)
-            elif t == "2": active.discard(sid)
-    return active
-def _effective_windows(start: date, days: int, cal: List[Dict], cd: List[Dict]) -> List[Tuple[date, date]]:
+def _weekday_mask(cal_row: List[str], header: CsvHeader) -> Tuple[bool, bool, bool, bool, bool, bool, bool]:
+    return tuple(cal_row[header[day]] == "1" for day in WEEKDAYS)
+def _weekday_bits(mask: Tuple[bool, ...], lo: int, hi: int, origin: int) -> int:
+    lo_wd = (lo - 1) % 7
+    week = 0
+    for k in range(7):
+        if mask[(lo_wd + k) % 7]:
+            week |= 1 << k
+    span = hi - lo + 1
+    # repeat the 7-bit week across the span (week * 0b...0000001_0000001), then trim
+    repunit = ((1 << (7 * ((span + 6) // 7))) - 1) // 127
+    return (week * repunit & ((1 << span) - 1)) << (lo - origin)
+def _service_day_bits(start: date, days: int, calendar: Table, calendar_dates: Table) -> Dict[str, int]:
+    first = start.toordinal()
+    last = first + days
+    bits: Dict[str, int] = defaultdict(int)
+    parse, fill, weekday_mask = _yyyymmdd_to_date, _weekday_bits, _weekday_mask
+    ch, cal_rows = calendar
+    c_svc, c_start, c_end = ch["service_id"], ch["start_date"], ch["end_date"]
+    for row in cal_rows:
+        s = parse(row[c_start])
+        e = parse(row[c_end])
+        if not (s and e):
+            continue
+        lo = s.toordinal()
+        hi = e.toordinal()
+        if lo < first: lo = first
+        if hi > last: hi = last
+        if lo > hi:
+            continue
+        bits[row[c_svc]] |= fill(weekday_mask(row, ch), lo, hi, first)
+    dh, cd_rows = calendar_dates
+    d_svc, d_date, d_type = dh["service_id"], dh["date"], dh["exception_type"]
+    for exc in cd_rows:
+        d = parse(exc[d_date])
+        if not d:
+            continue
+        i = d.toordinal() - first
+        if not 0 <= i <= days:
+            continue
+        t = exc[d_type]
+        if t == "1": bits[exc[d_svc]] |= 1 << i
+        elif t == "2": bits[exc[d_svc]] &= ~(1 << i)
+    return bits
+def _effective_windows(start: date, days: int, cal: Table, cd: Table) -> List[Tuple[date, date]]:
     if days <= 0: return []
-    def sig(sids: Set[str]) -> Tuple[int, int]:
-        if not sids: return (0,0)
-        payload = "|".join(sorted(sids)).encode()
-        import hashlib
-        return (len(sids), int(hashlib.sha1(payload).hexdigest()[:8], 16))
+    # bit i set <=> some service is active on day i but not on day i-1, or vice versa
+    changed = 0
+    for b in _service_day_bits(start, days, cal, cd).values():
+        changed |= b ^ (b << 1)
+    changed &= (1 << (days + 1)) - 2
+    td, one_day = timedelta, timedelta(days=1)
     cur_from = start
-    cur_set = _active_services_on(start, cal, cd)
-    cur_sig = sig(cur_set)
     wins = []
-    for i in range(1, days+1):
-        d = start + timedelta(days=i)
-        s = _active_services_on(d, cal, cd)
-        sg = sig(s)
-        if sg != cur_sig:
-            wins.append((cur_from, d - timedelta(days=1)))
-            cur_from, cur_set, cur_sig = d, s, sg
+    append = wins.append
+    while changed:
+        low = changed & -changed
+        d = start + td(days=low.bit_length() - 1)
+        append((cur_from, d - one_day))
+        cur_from = d
+        changed ^= low
     wins.append((cur_from, start + timedelta(days=days)))
     return wins
 def _parse_ymd(s: str) -> Optional[date]:
     return _yyyymmdd_to_date(s)
-def _active_dates_for_service(service_id: str, calendar: Dict, exceptions: List[Dict]) -> Set[date]:
-    active: Set[date] = set()
-    start = _parse_ymd(calendar.get("start_date",""))
-    end   = _parse_ymd(calendar.get("end_date",""))
+def _active_dates_for_service(
+    calendar: Optional[List[str]],
+    cal_header: CsvHeader,
+    mask: Tuple[bool, ...],
+    exceptions: List[List[str]],
+    cd_header: CsvHeader
+) -> int:
+    active = 0
+    start = _parse_ymd(calendar[cal_header["start_date"]]) if calendar else None
+    end   = _parse_ymd(calendar[cal_header["end_date"]]) if calendar else None
     if start and end:
-        mask = _weekday_mask(calendar)
-        cur = start
-        while cur <= end:
-            if mask[cur.weekday()]:
-                active.add(cur)
-            cur += timedelta(days=1)
+        lo = max(start.toordinal(), EPOCH_ORD)
+        hi = end.toordinal()
+        if lo <= hi:
+            active = _weekday_bits(mask, lo, hi, EPOCH_ORD)
+    parse, epoch_ord = _yyyymmdd_to_date, EPOCH_ORD
+    d_date, d_type = cd_header["date"], cd_header["exception_type"]
     for exc in exceptions:
-        if exc.get("service_id") == service_id:
-            d = _parse_ymd(exc.get("date",""))
-            if not d: continue
-            t = exc.get("exception_type","")
-            if t == "1": active.add(d)
-            elif t == "2": active.discard(d)
+        d = parse(exc[d_date])
+        if not d: continue
+        i = d.toordinal() - epoch_ord
+        if i < 0: continue
+        t = exc[d_type]
+        if t == "1": active |= 1 << i
+        elif t == "2": active &= ~(1 << i)
     return active
+def _overlap_and_pick(
+    bits: List[int],
+    starts: List[int],
+    pivot_bit: int,
+    overlap_max_days: int
+) -> Tuple[Optional[int], List[Tuple[int, int, int]], List[int]]:
+    # ints only: bits are EPOCH-relative day bitsets, starts are ordinals (0 = unknown)
+    order = sorted(range(len(bits)), key=lambda i: bits[i].bit_count(), reverse=True)
+    counts = [bits[i].bit_count() for i in order]
+    # heaviest first: a pair can't overlap by more days than its smaller member is active
+    for a in range(len(order) - 1):
+        if counts[a + 1] <= overlap_max_days:
+            break
+        A = bits[order[a]]
+        for b in range(a + 1, len(order)):
+            if counts[b] <= overlap_max_days:
+                break
+            ov = (A & bits[order[b]]).bit_count()
+            if ov > overlap_max_days:
+                return ov, [], []
+    keys = [(b.bit_length() - 1, (b >> pivot_bit).bit_count(), start) for b, start in zip(bits, starts)]
+    best = max(keys)
+    return None, keys, [i for i, k in enumerate(keys) if k == best]
 def _choose_service_winner_factual(
     services: List[str],
-    calendars: Dict[str, Dict],
-    calendar_dates: List[Dict],
+    calendars: Dict[str, List[str]],
+    cal_header: CsvHeader,
+    masks: Dict[str, Tuple[bool, ...]],
+    cd_by_service: Dict[str, List[List[str]]],
+    cd_header: CsvHeader,
     pivot_date: date,
     overlap_max_days: int
 ) -> Tuple[Optional[str], List[str], bool]:
     if len(services) <= 1:
         return (services[0] if services else None, ["Only one service in group"], False)
     reasons: List[str] = []
-    metrics: Dict[str, Dict] = {}
+    bits: List[int] = []
+    starts: List[int] = []
     for svc_id in services:
-        cal = calendars.get(svc_id, {})
-        exceptions = [exc for exc in calendar_dates if exc.get("service_id") == svc_id]
-        active_dates = _active_dates_for_service(svc_id, cal, exceptions)
-        start = _parse_ymd(cal.get("start_date",""))
-        last_active = max(active_dates) if active_dates else None
-        active_after_pivot = sum(1 for d in active_dates if d >= pivot_date)
-        metrics[svc_id] = {
-            "active_dates": active_dates,
-            "start_date": start,
-            "last_active_date": last_active,
-            "active_after_pivot": active_after_pivot,
-        }
-    max_overlap = 0
-    for i, a in enumerate(services):
-        A = metrics[a]["active_dates"]
-        for b in services[i+1:]:
-            B = metrics[b]["active_dates"]
-            ov = len(A & B)
-            if ov > max_overlap:
-                max_overlap = ov
-    if max_overlap > overlap_max_days:
-        reasons.append(f"Ambiguous: services overlap by {max_overlap} days (> {overlap_max_days})")
+        cal = calendars.get(svc_id)
+        exceptions = cd_by_service.get(svc_id, ())
+        bits.append(_active_dates_for_service(cal, cal_header, masks.get(svc_id), exceptions, cd_header))
+        start = _parse_ymd(cal[cal_header["start_date"]]) if cal else None
+        starts.append(start.toordinal() if start else 0)
+    pivot_bit = max(pivot_date.toordinal() - EPOCH_ORD, 0)
+    overlap, keys, picked = _overlap_and_pick(bits, starts, pivot_bit, overlap_max_days)
+    if overlap is not None:
+        reasons.append(f"Ambiguous: services overlap by {overlap} days (> {overlap_max_days})")
         return (None, reasons, True)
-    candidates = services[:]
-    last_dates = [m["last_active_date"] for m in metrics.values() if m["last_active_date"]]
-    max_last = max(last_dates) if last_dates else None
-    if max_last:
-        candidates = [s for s in candidates if metrics[s]["last_active_date"] == max_last]
-        if len(candidates) == 1:
-            reasons.append(f"Latest last_active_date: {max_last:%Y-%m-%d}")
+    candidates = [services[i] for i in picked]
+    best = keys[picked[0]]
+    max_last, max_after, max_start = best
+    # the winner is already known; count ties per criterion only to report which one decided
+    if max_last >= 0:
+        last_date = EPOCH + timedelta(days=max_last)
+        if sum(1 for k in keys if k[0] == max_last) == 1:
+            reasons.append(f"Latest last_active_date: {last_date:%Y-%m-%d}")
             return (candidates[0], reasons, False)
-        reasons.append(f"Tied on last_active_date: {max_last:%Y-%m-%d}")
-    if candidates:
-        max_after = max(metrics[s]["active_after_pivot"] for s in candidates)
-        candidates = [s for s in candidates if metrics[s]["active_after_pivot"] == max_after]
-        if len(candidates) == 1:
-            reasons.append(f"Most active days after pivot ({max_after} days)")
-            return (candidates[0], reasons, False)
-        if max_after > 0:
-            reasons.append(f"Tied on active days after pivot: {max_after}")
-    starts = [metrics[s]["start_date"] for s in candidates if metrics[s]["start_date"]]
-    max_start = max(starts) if starts else None
+        reasons.append(f"Tied on last_active_date: {last_date:%Y-%m-%d}")
+    if sum(1 for k in keys if k[:2] == best[:2]) == 1:
+        reasons.append(f"Most active days after pivot ({max_after} days)")
+        return (candidates[0], reasons, False)
+    if max_after > 0:
+        reasons.append(f"Tied on active days after pivot: {max_after}")
     if max_start:
-        candidates = [s for s in candidates if metrics[s]["start_date"] == max_start]
+        start_date = date.fromordinal(max_start)
         if len(candidates) == 1:
-            reasons.append(f"Latest start_date: {max_start:%Y-%m-%d}")
+            reasons.append(f"Latest start_date: {start_date:%Y-%m-%d}")
             return (candidates[0], reasons, False)
-        reasons.append(f"Tied on start_date: {max_start:%Y-%m-%d}")
+        reasons.append(f"Tied on start_date: {start_date:%Y-%m-%d}")
     try:
         c_int = sorted([(int(s), s) for s in candidates], reverse=True)
         winner = c_int[0][1]
@@ -196,48 +317,68 @@ def _choose_service_winner_factual(
         winner = candidates[0]
         reasons.append(f"Tiebreaker: lexicographically highest service_id ({winner})")
         return (winner, reasons, False)
+def _choose_winners(jobs: List[Tuple], workers: int) -> List[Tuple[Optional[str], List[str], bool]]:
+    if workers <= 1 or len(jobs) < PARALLEL_MIN_GROUPS:
+        return [_choose_service_winner_factual(*job) for job in jobs]
+    workers = min(workers, len(jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_choose_service_winner_factual, *zip(*jobs),
+                             chunksize=max(1, len(jobs) // (workers * 4))))
 def _build_route_grouping(
-    calendar_rows: List[Dict],
-    trips: List[Dict]
-) -> Tuple[Dict[Tuple[Tuple[bool, ...], Tuple[str, ...]], List[str]], Dict[str, Set[str]]]:
+    calendar: Table,
+    trips: Table
+) -> Tuple[
+    Dict[Tuple[Tuple[bool, ...], Tuple[str, ...]], List[str]],
+    Dict[str, Set[str]],
+    Dict[str, Tuple[bool, ...]],
+]:
     service_routes: Dict[str, Set[str]] = defaultdict(set)
-    for trip in trips:
-        service_id = trip.get("service_id")
+    th, trip_rows = trips
+    for trip in trip_rows:
+        service_id = trip[th["service_id"]]
         if not service_id:
             continue
-        route_id = trip.get("route_id") or UNKNOWN_ROUTE_ID
+        route_id = trip[th["route_id"]] or UNKNOWN_ROUTE_ID
         service_routes[service_id].add(route_id)
 
     groups: Dict[Tuple[Tuple[bool, ...], Tuple[str, ...]], List[str]] = defaultdict(list)
-    for cal in calendar_rows:
-        service_id = cal.get("service_id")
+    masks: Dict[str, Tuple[bool, ...]] = {}
+    ch, cal_rows = calendar
+    for cal in cal_rows:
+        service_id = cal[ch["service_id"]]
         if not service_id:
             continue
-        mask = _weekday_mask(cal)
+        mask = masks[service_id] = _weekday_mask(cal, ch)
         routes = tuple(sorted(service_routes.get(service_id) or {UNKNOWN_ROUTE_ID}))
         groups[(mask, routes)].append(service_id)
 
-    return groups, service_routes
+    return groups, service_routes, masks
 
 
 def _prune_overlaps_factual(
-    agencies: List[Dict],
-    calendar_rows: List[Dict],
-    calendar_dates: List[Dict],
-    trips: List[Dict],
+    agencies: Table,
+    calendar: Table,
+    calendar_dates: Table,
+    trips: Table,
     stop_times: List[Dict],
-    feed_info: List[Dict],
-    overlap_max_days: int
-) -> Tuple[List[Dict], List[Dict], List[Dict], List[Dict], Dict]:
+    feed_info: Table,
+    overlap_max_days: int,
+    workers: int = 1
+) -> Tuple[Table, Table, Table, List[Dict], Dict]:
     pivot = datetime.utcnow().date()
-    if feed_info:
-        fs = _parse_ymd(feed_info[0].get("feed_start_date","") or "")
+    if feed_info[1]:
+        fs = _parse_ymd(_first_value(feed_info, "feed_start_date") or "")
         if fs:
             if fs > pivot:
                 pivot = fs
     print(f"  - Pivot date: {pivot:%Y-%m-%d}")
-    calendars_dict = {cal["service_id"]: cal for cal in calendar_rows}
-    groups, _ = _build_route_grouping(calendar_rows, trips)
+    ch, cal_rows = calendar
+    calendars_dict = {cal[ch["service_id"]]: cal for cal in cal_rows}
+    dh, cd_rows = calendar_dates
+    cd_by_service: Dict[str, List[List[str]]] = defaultdict(list)
+    for exc in cd_rows:
+        cd_by_service[exc[dh["service_id"]]].append(exc)
+    groups, _, mask_by_service = _build_route_grouping(calendar, trips)
 
     diagnostics = {
         "pivot_date": pivot.strftime("%Y-%m-%d"),
@@ -254,9 +395,24 @@ def _prune_overlaps_factual(
 
     print(f"  - Found {len(groups)} route-aware weekday-mask groups")
 
+    ordered_groups = sorted(groups.items(), key=lambda item: (item[0][0], item[0][1]))
+    contested = [(key, service_ids) for key, service_ids in ordered_groups
+                 if len(service_ids) > 1 and sum(1 for f in key[0] if f) > 2]
+    jobs = [(
+        service_ids,
+        {s: calendars_dict.get(s) for s in service_ids},
+        ch,
+        {s: mask_by_service[s] for s in service_ids},
+        {s: cd_by_service.get(s, []) for s in service_ids},
+        dh,
+        pivot,
+        overlap_max_days,
+    ) for _, service_ids in contested]
+    picks = dict(zip((key for key, _ in contested), _choose_winners(jobs, workers)))
+
     services_to_keep: Set[str] = set()
     services_to_prune: Set[str] = set()
-    for (mask, route_ids), service_ids in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1])):
+    for (mask, route_ids), service_ids in ordered_groups:
         active_day_count = sum(1 for f in mask if f)
         route_label = ",".join(route_ids)
         if len(service_ids) <= 1:
@@ -286,9 +442,7 @@ def _prune_overlaps_factual(
             )
             continue
 
-        winner, reasons, is_ambiguous = _choose_service_winner_factual(
-            service_ids, calendars_dict, calendar_dates, pivot, overlap_max_days
-        )
+        winner, reasons, is_ambiguous = picks[(mask, route_ids)]
 
         diagnostics["groups"].append({
             "weekday_mask": str(mask),
@@ -316,21 +470,21 @@ def _prune_overlaps_factual(
                 f"    - Group {mask} routes [{route_label}]: keeping {winner}, pruning {len(pruned)} services"
             )
 
-    cal_f = [c for c in calendar_rows   if c["service_id"] in services_to_keep]
-    cd_f  = [d for d in calendar_dates  if d["service_id"] in services_to_keep]
-    kept_trip_ids: Set[str] = set()
-    trips_f = []
-    for t in trips:
-        if t.get("service_id") in services_to_keep:
-            trips_f.append(t)
-            kept_trip_ids.add(t.get("trip_id",""))
-    stop_times_f = [st for st in stop_times if st.get("trip_id") in kept_trip_ids]
+    th, trip_rows = trips
+    kept = frozenset(services_to_keep)
+    c_svc, d_svc, t_svc, t_trip = ch["service_id"], dh["service_id"], th["service_id"], th["trip_id"]
+    cal_f   = [c for c in cal_rows  if c[c_svc] in kept]
+    cd_f    = [d for d in cd_rows   if d[d_svc] in kept]
+    trips_f = [t for t in trip_rows if t[t_svc] in kept]
+    kept_trip_ids = frozenset(t[t_trip] for t in trips_f)
+    stop_times_f = list(compress(stop_times, map(kept_trip_ids.__contains__, map(itemgetter("trip_id"), stop_times))))
     print("Pruning summary:")
     print(f"  services kept: {len(services_to_keep)}   pruned: {len(services_to_prune)}")
-    print(f"  trips: {len(trips)} → {len(trips_f)}   stop_times: {len(stop_times)} → {len(stop_times_f)}")
-    return cal_f, cd_f, trips_f, stop_times_f, diagnostics
+    print(f"  trips: {len(trip_rows)} → {len(trips_f)}   stop_times: {len(stop_times)} → {len(stop_times_f)}")
+    return (ch, cal_f), (dh, cd_f), (th, trips_f), stop_times_f, diagnostics
 def build(gtfs_url: str, out_dir: Path, target_date: Optional[date], window_days: int,
-          prune_mode: str, overlap_max_days: int) -> None:
+          prune_mode: str, overlap_max_days: int, prune_workers: int = 1,
+          default_tz: Optional[str] = None) -> None:
     tmp = out_dir.parent / ".tmp"
     tmp.mkdir(parents=True, exist_ok=True)
     zip_path = tmp / "irish_rail.zip"
@@ -342,145 +496,148 @@ def build(gtfs_url: str, out_dir: Path, target_date: Optional[date], window_days
     routes         = z.read_csv("routes.txt")
     trips          = z.read_csv("trips.txt")
     stop_times     = z.read_csv("stop_times.txt")
-    calendar_rows  = z.read_csv("calendar.txt")
+    calendar       = z.read_csv("calendar.txt")
     calendar_dates = z.read_csv("calendar_dates.txt")
     feed_info      = z.read_csv("feed_info.txt")
     today = date.today()
     if not target_date:
-        tz = None
-        if agencies:
-            tz_name = agencies[0].get("agency_timezone")
-            if tz_name and ZoneInfo is not None:
-                try:
-                    tz = ZoneInfo(tz_name)
-                except Exception:
-                    tz = None
+        tz_name = default_tz or _first_value(agencies, "agency_timezone")
+        tz = _get_tz(tz_name) if tz_name else None
         if tz:
             today = datetime.now(tz).date()
         target_date = today
     else:
         today = target_date
     raw_version = None
-    if feed_info:
-        candidate = (feed_info[0].get("feed_version") or "").strip()
+    if feed_info[1]:
+        candidate = (_first_value(feed_info, "feed_version") or "").strip()
         raw_version = candidate or None
     if not raw_version:
         raw_version = datetime.utcnow().strftime("%Y%m%d")
     version = f"kg-{raw_version}"
-    stops_typed = []
-    for s in stops:
-        stops_typed.append({
-            "stop_id": s.get("stop_id",""),
-            "stop_code": s.get("stop_code",""),
-            "stop_name": s.get("stop_name",""),
-            "stop_desc": s.get("stop_desc",""),
-            "stop_lat": _safe_float(s.get("stop_lat")),
-            "stop_lon": _safe_float(s.get("stop_lon")),
-            "zone_id": s.get("zone_id",""),
-            "stop_url": s.get("stop_url",""),
-            "location_type": s.get("location_type",""),
-            "parent_station": s.get("parent_station",""),
-        })
-    stop_times_typed = []
-    for st in stop_times:
-        stop_times_typed.append({
-            "trip_id": st.get("trip_id",""),
-            "arrival_time": st.get("arrival_time",""),
-            "departure_time": st.get("departure_time",""),
-            "stop_id": st.get("stop_id",""),
-            "stop_sequence": _safe_int(st.get("stop_sequence")),
-            "stop_headsign": st.get("stop_headsign",""),
-            "pickup_type": st.get("pickup_type",""),
-            "drop_off_type": st.get("drop_off_type",""),
-            "timepoint": st.get("timepoint",""),
-        })
-    calendar_typed = []
-    for c in calendar_rows:
-        row = dict(c)
-        for day in ("monday","tuesday","wednesday","thursday","friday","saturday","sunday"):
-            row[day] = (row.get(day,"0") == "1")
-        calendar_typed.append(row)
+    sh, stop_rows = stops
+    s_id, s_code, s_name, s_desc, s_lat, s_lon, s_zone, s_url, s_type, s_parent = (
+        sh[c] for c in ("stop_id", "stop_code", "stop_name", "stop_desc", "stop_lat", "stop_lon",
+                        "zone_id", "stop_url", "location_type", "parent_station"))
+    def typed_stops(to_float):
+        return [{
+            "stop_id": s[s_id],
+            "stop_code": s[s_code],
+            "stop_name": s[s_name],
+            "stop_desc": s[s_desc],
+            "stop_lat": to_float(s[s_lat] or "0"),
+            "stop_lon": to_float(s[s_lon] or "0"),
+            "zone_id": s[s_zone],
+            "stop_url": s[s_url],
+            "location_type": s[s_type],
+            "parent_station": s[s_parent],
+        } for s in stop_rows]
+    try:
+        stops_typed = typed_stops(float)
+    except ValueError:
+        stops_typed = typed_stops(_safe_float)
+    sth, stop_time_rows = stop_times
+    t_trip, t_arr, t_dep, t_stop, t_seq, t_sign, t_pick, t_drop, t_point = (
+        sth[c] for c in ("trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence",
+                         "stop_headsign", "pickup_type", "drop_off_type", "timepoint"))
+    def typed_stop_times(to_int):
+        return [{
+            "trip_id": st[t_trip],
+            "arrival_time": st[t_arr],
+            "departure_time": st[t_dep],
+            "stop_id": st[t_stop],
+            "stop_sequence": to_int(st[t_seq] or "0"),
+            "stop_headsign": st[t_sign],
+            "pickup_type": st[t_pick],
+            "drop_off_type": st[t_drop],
+            "timepoint": st[t_point],
+        } for st in stop_time_rows]
+    try:
+        stop_times_typed = typed_stop_times(int)
+    except ValueError:
+        stop_times_typed = typed_stop_times(_safe_int)
     diagnostics = None
     if prune_mode == "factual":
         print("Applying overlap pruning (factual mode)...")
         cal_filtered, cd_filtered, trips_filtered, stop_times_filtered, diagnostics = _prune_overlaps_factual(
             agencies=agencies,
-            calendar_rows=calendar_rows,  
+            calendar=calendar,
             calendar_dates=calendar_dates,
             trips=trips,
             stop_times=stop_times_typed, 
             feed_info=feed_info,
-            overlap_max_days=overlap_max_days
+            overlap_max_days=overlap_max_days,
+            workers=prune_workers
         )
-        calendar_typed = []
-        for c in cal_filtered:
-            row = dict(c)
-            for day in ("monday","tuesday","wednesday","thursday","friday","saturday","sunday"):
-                row[day] = (row.get(day,"0") == "1")
-            calendar_typed.append(row)
-        calendar_rows  = cal_filtered
+        calendar       = cal_filtered
         calendar_dates = cd_filtered
         trips          = trips_filtered
         stop_times_typed = stop_times_filtered
     else:
         print("Skipping overlap pruning (mode: off)")
+    ch, cal_rows = calendar
+    cal_names = list(ch)
+    mon, tue, wed, thu, fri, sat, sun = (ch[day] for day in WEEKDAYS)
+    calendar_typed = [{
+        **dict(zip(cal_names, c)),
+        "monday": c[mon] == "1",
+        "tuesday": c[tue] == "1",
+        "wednesday": c[wed] == "1",
+        "thursday": c[thu] == "1",
+        "friday": c[fri] == "1",
+        "saturday": c[sat] == "1",
+        "sunday": c[sun] == "1",
+    } for c in cal_rows]
     feed_version_meta = None
-    if feed_info:
-        raw_feed_version = (feed_info[0].get("feed_version") or "").strip()
+    if feed_info[1]:
+        raw_feed_version = (_first_value(feed_info, "feed_version") or "").strip()
         feed_version_meta = raw_feed_version or None
     if not feed_version_meta:
         feed_version_meta = raw_version
 
-    wins = _effective_windows(today, window_days, calendar_rows, calendar_dates)
+    wins = _effective_windows(today, window_days, calendar, calendar_dates)
     windows_json = {
         "generatedAt": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "scan": {"from": _date_to_yyyymmdd(today),
                  "to": _date_to_yyyymmdd(today + timedelta(days=window_days))},
         "feed": {
             "version": feed_version_meta,
-            "startDate": (feed_info[0].get("feed_start_date") if feed_info else None),
-            "endDate":   (feed_info[0].get("feed_end_date")   if feed_info else None),
+            "startDate": _first_value(feed_info, "feed_start_date"),
+            "endDate":   _first_value(feed_info, "feed_end_date"),
         },
         "windows": [{"from": _date_to_yyyymmdd(a), "to": _date_to_yyyymmdd(b)} for a,b in wins]
     }
     version_dir = out_dir / "gtfs" / version
     version_dir.mkdir(parents=True, exist_ok=True)
-    def dump(obj, name):
+    files: Dict[str, str] = {}
+    def dump(obj, name, pretty=False):
         p = version_dir / name
-        with open(p, "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+        if p.suffix == ".ndjson":
+            _write_ndjson(obj, p)
+        else:
+            _write_json(obj, p, pretty)
+        files[p.stem] = name
         print(f"wrote {p}")
     dump(stops_typed, "stops.json")
-    with open(version_dir / "routes.json","w",encoding="utf-8") as f:
-        json.dump(routes, f, ensure_ascii=False, indent=2)
-    print(f"wrote {version_dir/'routes.json'}")
-    with open(version_dir / "trips.json","w",encoding="utf-8") as f:
-        json.dump(trips, f, ensure_ascii=False, indent=2)
-    print(f"wrote {version_dir/'trips.json'}")
-    dump(stop_times_typed, "stop_times.json")
+    dump(_as_dicts(routes), "routes.json", pretty=True)
+    dump(_as_dicts(trips), "trips.ndjson")
+    dump(stop_times_typed, "stop_times.ndjson")
     dump(calendar_typed,    "calendar.json")
-    with open(version_dir / "calendar_dates.json","w",encoding="utf-8") as f:
-        json.dump(calendar_dates, f, ensure_ascii=False, indent=2)
-    print(f"wrote {version_dir/'calendar_dates.json'}")
-    with open(version_dir / "agencies.json","w",encoding="utf-8") as f:
-        json.dump(agencies, f, ensure_ascii=False, indent=2)
-    print(f"wrote {version_dir/'agencies.json'}")
+    dump(_as_dicts(calendar_dates), "calendar_dates.ndjson")
+    dump(_as_dicts(agencies), "agencies.json", pretty=True)
     out_dir.mkdir(parents=True, exist_ok=True)
-    with open(out_dir / "windows.json","w",encoding="utf-8") as f:
-        json.dump(windows_json, f, ensure_ascii=False, indent=2)
-    latest = {"latest": version, "generatedAt": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")}
-    with open(out_dir / "latest.json","w",encoding="utf-8") as f:
-        json.dump(latest, f, ensure_ascii=False, indent=2)
-    status = {"ok": True, **latest}
-    with open(out_dir / "status.json","w",encoding="utf-8") as f:
-        json.dump(status, f, ensure_ascii=False, indent=2)
+    _write_json(windows_json, out_dir / "windows.json", pretty=True)
+    latest = {"latest": version, "generatedAt": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"), "files": files}
+    _write_json(latest, out_dir / "latest.json", pretty=True)
+    status = {"ok": True, "latest": version, "generatedAt": latest["generatedAt"]}
+    _write_json(status, out_dir / "status.json", pretty=True)
     print("\nSummary")
     print(f"  version: {version}")
     print(f"  stops: {len(stops_typed)}")
-    print(f"  routes: {len(routes)}")
-    print(f"  trips: {len(trips)}")
+    print(f"  routes: {len(routes[1])}")
+    print(f"  trips: {len(trips[1])}")
     print(f"  stop_times: {len(stop_times_typed)}")
-    print(f"  calendar rows: {len(calendar_rows)}  calendar_dates: {len(calendar_dates)}")
+    print(f"  calendar rows: {len(calendar[1])}  calendar_dates: {len(calendar_dates[1])}")
     if len(wins) > 1:
         print(f"  next timetable change: {_date_to_yyyymmdd(wins[1][0])}")
 if __name__ == "__main__":
@@ -491,8 +648,11 @@ if __name__ == "__main__":
     target_date = _yyyymmdd_to_date(tgt) if tgt else None
     prune_mode  = (os.environ.get("PRUNE_OVERLAPS","factual") or "factual").lower()
     overlap_max = int(os.environ.get("OVERLAP_MAX_DAYS","45") or "45")
+    prune_workers = int(os.environ.get("PRUNE_WORKERS", "1") or "1")
+    default_tz  = (os.environ.get("GTFS_DEFAULT_TZ") or "").strip() or None
 
     try:
-        build(gtfs_url, out_dir, target_date, window_days, prune_mode, overlap_max)
+        build(gtfs_url, out_dir, target_date, window_days, prune_mode, overlap_max, prune_workers,
+              default_tz)
     except KeyboardInterrupt:
         sys.exit(130)
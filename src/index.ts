@@ -13,7 +13,10 @@ const JSON_FILES = new Set([
   "stop_times.json",
   "calendar.json",
   "calendar_dates.json",
-  "agencies.json"
+  "agencies.json",
+  "trips.ndjson",
+  "stop_times.ndjson",
+  "calendar_dates.ndjson"
 ])
 
 function cors(h = new Headers()) {
@@ -72,7 +75,7 @@ export default {
       if (url.pathname === "/latest.json") return serveR2Object(request, env, "latest.json", SHORT_60, false, ctx)
       if (url.pathname === "/status.json") return serveR2Object(request, env, "status.json", SHORT_30, false, ctx)
       if (url.pathname === "/windows.json") return serveR2Object(request, env, "windows.json", 3600, false, ctx)
-      const m = url.pathname.match(/^\/gtfs\/([A-Za-z0-9-]+)\/([a-z_]+\.json)$/)
+      const m = url.pathname.match(/^\/gtfs\/([A-Za-z0-9-]+)\/([a-z_]+\.(?:nd)?json)$/)
       if (m) {
         const [, ver, file] = m
         if (!JSON_FILES.has(file)) return new Response(JSON.stringify({ error: "invalid file" }), { status: 400, headers: withCommon(cors()) })
@@ -14,6 +14,9 @@ const JSON_FILES = new Set([
   "calendar.json",
   "calendar_dates.json",
   "agencies.json",
+  "trips.ndjson",
+  "stop_times.ndjson",
+  "calendar_dates.ndjson",
 ]);
 
 function cors(h = new Headers()) {
@@ -99,7 +102,7 @@ export default {
         return serveR2Object(request, env, "windows.json", 3600, false);
       }
 
-      const m = url.pathname.match(/^\/gtfs\/([A-Za-z0-9-]+)\/([a-z_]+\.json)$/);
+      const m = url.pathname.match(/^\/gtfs\/([A-Za-z0-9-]+)\/([a-z_]+\.(?:nd)?json)$/);
       if (m) {
         const [, ver, file] = m;
         if (!JSON_FILES.has(file)) {